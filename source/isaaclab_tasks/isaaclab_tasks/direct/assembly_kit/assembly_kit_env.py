@@ -8,20 +8,24 @@
 from __future__ import annotations
 
 import math
-import random
 import torch
 from collections.abc import Sequence
+from typing import Any
 
 import isaaclab.sim as sim_utils
 from isaaclab.assets import Articulation, RigidObject, RigidObjectCfg
-from isaaclab.envs import DirectRLEnv
+from isaaclab.envs import DirectRLEnv, VecEnvObs
 from isaaclab.sensors import Camera, FrameTransformer
 from isaaclab.sim.spawners.from_files import GroundPlaneCfg, spawn_ground_plane
-from isaaclab.utils.math import euler_xyz_from_quat, quat_apply, quat_from_euler_xyz
+from isaaclab.utils.math import quat_from_euler_xyz
 
 from .assembly_kit_env_cfg import AssemblyKitEnvCfg, get_kit_cfg, get_model_cfg
 
 
+_LAYOUT_SEED_OFFSET = 0x9E3779B97F4A7C15
+"""Offset added to the env seed for the model layout generator, keeps its stream apart from the global one."""
+
+
 class AssemblyKitEnv(DirectRLEnv):
     """Direct-RL environment for the Assembly-Kit task in Isaac Lab.
 
@@ -49,13 +53,62 @@ class AssemblyKitEnv(DirectRLEnv):
 
         super().__init__(cfg, render_mode, **kwargs)
 
-        random.seed(self.cfg.seed)
+        # dedicated generator for the reset sampling, seeded from the env config when available
+        # and reseeded together with the global generators in reset(seed=...)
+        self._gen = torch.Generator(device=self.device)
+        self._seed_layout_generator(self.cfg.seed)
 
         self.joint_ids, _ = self.robot.find_joints("panda_joint.*|panda_finger_joint.*")
 
         self.target_model_goal_pos = torch.zeros((self.num_envs, 3), dtype=torch.float32, device=self.device)
         self.target_model_goal_rot = torch.zeros((self.num_envs,), dtype=torch.float32, device=self.device)
 
+        # kit default state in env-local frame, the kit is kinematic so it stays fixed across resets.
+        # both the kit reset and the model placement read it; refresh it if the kit default state is changed
+        self._kit_default_state = self.kit.data.default_root_state.clone()
+        # kit-relative offset used to park non-target models beside the table
+        self._side_pos = torch.tensor([-self.cfg.TABLE_OFFSET, 0.2, 0.1], dtype=torch.float32, device=self.device)
+        # tcp pose (7) + target pose (7) + target - tcp (3) + goal pos (3) + goal rot (1) + goal - target (3) + shape
+        self._state_obs_dim = 24 + self.num_shape_types
+
+        # per-step caches, shared by the dones, rewards and observations of a step (see _target_model_pose)
+        self._cached_target_pose: torch.Tensor | None = None
+        self._cached_success: tuple[tuple[float, float, float], torch.Tensor] | None = None
+
+    def reset(self, seed: int | None = None, options: dict[str, Any] | None = None) -> tuple[VecEnvObs, dict]:
+        """Resets all the environments and returns observations.
+
+        Besides the global generators seeded by :class:`DirectRLEnv`, a given seed also reseeds the
+        generator used to sample the model layout, so ``reset(seed=...)`` reproduces it.
+
+        Args:
+            seed: The seed to use for randomization. Defaults to None, in which case the seed is not set.
+            options: Additional information to specify how the environment is reset. Defaults to None.
+
+        Returns:
+            A tuple containing the observations and extras.
+        """
+        if seed is not None:
+            # resolve the seed actually used (e.g. for -1) so the layout generator follows it
+            seed = self.seed(seed)
+            self._seed_layout_generator(seed)
+        return super().reset(seed=None, options=options)
+
+    def _seed_layout_generator(self, seed: int | None) -> None:
+        """Seeds the model layout generator from the env seed.
+
+        :func:`configure_seed` seeds the global CUDA generator with the env seed itself. The layout generator
+        is seeded with an offset value instead, otherwise both would produce the same random stream and the layout
+        draws would be correlated with every other draw on the global generator (action noise, events, ...).
+
+        Args:
+            seed: The env seed. If None, the generator is seeded non-deterministically.
+        """
+        if seed is None:
+            self._gen.seed()
+        else:
+            self._gen.manual_seed((seed + _LAYOUT_SEED_OFFSET) % 2**64)
+
     def _load_table_scene(self):
         """Spawns the ground plane, table, robot, and camera into the simulation.
 
@@ -115,56 +168,33 @@ class AssemblyKitEnv(DirectRLEnv):
             self.models.append(RigidObject(model_cfg))
             self.scene.rigid_objects[f"Model_{idx}"] = self.models[-1]
 
-        # Computing the Asset lookup table for the environment instances
-        self.env_assets_info = self._get_assets_info_per_env(self.cfg.kit_usd_paths, self.cfg.kit_model_ids)
-
-        self.init_model_sampling()
+        max_model_id = max(model_id for group in self.cfg.kit_model_ids for model_id in group)
+        self.init_model_sampling(max_model_id)
 
         # Filtering collisions for optimization of collisions between environment instances
         self.scene.filter_collisions(["/World/ground"])
 
-    def _get_assets_info_per_env(
-        self,
-        kit_usd_paths: list[str],
-        kit_model_ids: list[list[int]],
-    ) -> list[dict]:
-        """Constructs per-env metadata about which kit and models to use.
+    def init_model_sampling(self, max_model_id: int) -> None:
+        """Preallocates tensors for target and other model sampling across envs.
 
         Args:
-            kit_usd_paths:  List of all kit USD paths.
-            kit_model_ids:  Nested list mapping kit to its object IDs.
-
-        Returns:
-            List of dicts per env with 'kit_id' and 'model_ids'.
+            max_model_id: Largest object ID over all kits, used to size the shape one-hot encoding.
         """
-        num_envs = self.num_envs
-        num_kits = len(kit_usd_paths)
-        return [
-            {
-                "kit_id": env_id % num_kits,
-                "model_ids": kit_model_ids[env_id % num_kits],
-            }
-            for env_id in range(num_envs)
-        ]
-
-    def init_model_sampling(self) -> None:
-        """Preallocates tensors for target and other model sampling across envs."""
-        # pulled straight from the list-of-dicts you already built
-        model_ids_list = [info["model_ids"] for info in self.env_assets_info]
-        # assume same-length lists → a dense matrix
-        self.model_ids_matrix_per_env = torch.tensor(
-            model_ids_list,
-            dtype=torch.long,
-            device=self.device,
-        )
+        # assume same-length lists → a dense (num_kits, K) matrix, expanded to the kit of each env
+        kit_model_ids = torch.tensor(self.cfg.kit_model_ids, dtype=torch.long, device=self.device)
+        self.model_ids_matrix_per_env = kit_model_ids[self.kit_ids_per_env]
 
-        self.num_shape_types = int(self.model_ids_matrix_per_env.max().item()) + 1
+        self.num_shape_types = max_model_id + 1
 
         num_envs, K = self.model_ids_matrix_per_env.shape
         # to write into each reset
         self.current_target = torch.empty(num_envs, 1, dtype=torch.long, device=self.device)
         # one fewer column
         self.current_others = torch.empty(num_envs, K - 1, dtype=torch.long, device=self.device)
+        # shape id of the current target per env
+        self.current_target_model_id = torch.zeros(num_envs, dtype=torch.long, device=self.device)
+        # stacked root states of all models, refilled on every target pose query
+        self._root_buf = torch.empty((len(self.models), num_envs, 13), dtype=torch.float32, device=self.device)
 
     def _pre_physics_step(self, actions: torch.Tensor) -> None:
         self.actions = actions.clone()
@@ -175,13 +205,20 @@ class AssemblyKitEnv(DirectRLEnv):
         else:
             self.robot.set_joint_effort_target(self.actions, joint_ids=self.joint_ids)
 
-    def get_tcp_poses(self) -> torch.Tensor:
-        """
-        Returns an (N,7) tensor [x, y, z, qx, qy, qz, qw]
+    def get_tcp_poses(self, out: torch.Tensor | None = None) -> torch.Tensor:
+        """Returns the TCP poses in env-local coords.
+
+        Args:
+            out: Optional (N,7) tensor to write the poses into instead of allocating a new one.
+
+        Returns:
+            Tensor of shape (N,7) [x, y, z, qw, qx, qy, qz].
         """
-        pos = self.tcp_transformer.data.target_pos_w.squeeze(1) - self.scene.env_origins
-        quat = self.tcp_transformer.data.target_quat_w.squeeze(1)
-        return torch.cat((pos, quat), dim=1)
+        if out is None:
+            out = torch.empty((self.num_envs, 7), dtype=torch.float32, device=self.device)
+        torch.sub(self.tcp_transformer.data.target_pos_w.squeeze(1), self.scene.env_origins, out=out[:, 0:3])
+        out[:, 3:7] = self.tcp_transformer.data.target_quat_w.squeeze(1)
+        return out
 
     def _get_observations(self) -> dict:
         """Collects state or pixel observations for the policy.
@@ -192,37 +229,34 @@ class AssemblyKitEnv(DirectRLEnv):
         Returns:
             Dict with key 'policy' mapping to either a state tensor or image tensor.
         """
-        tcp_pose = self.get_tcp_poses()
-
-        target_model_pose = self.get_target_model_pose()
-
-        shape_one_hot = (
-            torch.nn.functional.one_hot(self.current_target_model_id, num_classes=self.num_shape_types)
-            .to(self.device)
-            .float()
-        )
-
-        state_obs = torch.cat(
-            (
-                tcp_pose,
-                target_model_pose,
-                target_model_pose[:, :3] - tcp_pose[:, :3],
-                self.target_model_goal_pos,
-                self.target_model_goal_rot.unsqueeze(1),
-                self.target_model_goal_pos - target_model_pose[:, :3],
-                shape_one_hot,
-            ),
-            dim=-1,
-        )
-
-        rgb = self.scene.sensors["camera"].data.output["rgb"]
-        pixels = (rgb.to(torch.float32) / 255.0).clone()  # normalize to [0,1]
+        # interval events run between the resets and the observations and may move the models
+        if self.cfg.events and "interval" in self.event_manager.available_modes:
+            self._invalidate_step_caches()
 
         # return according to obs_mode
-        if self.cfg.obs_mode == "state":
-            return {"policy": state_obs}
-        else:
-            return {"policy": pixels}
+        if self.cfg.obs_mode != "state":
+            rgb = self.scene.sensors["camera"].data.output["rgb"]
+            # normalize to [0,1]; promotes the uint8 image to float32 in a single op.
+            # a fresh tensor per step on purpose, the learning wrappers may still hold the previous obs_buf
+            return {"policy": torch.mul(rgb, 1.0 / 255.0)}
+
+        target_model_pose = self._target_model_pose()
+        target_model_pos = target_model_pose[:, :3]
+
+        # write every term straight into its slice of the output, no per-term temporaries
+        state_obs = torch.empty((self.num_envs, self._state_obs_dim), dtype=torch.float32, device=self.device)
+        tcp_pos = self.get_tcp_poses(out=state_obs[:, 0:7])[:, 0:3]
+        state_obs[:, 7:14] = target_model_pose
+        torch.sub(target_model_pos, tcp_pos, out=state_obs[:, 14:17])
+        state_obs[:, 17:20] = self.target_model_goal_pos
+        state_obs[:, 20] = self.target_model_goal_rot
+        torch.sub(self.target_model_goal_pos, target_model_pos, out=state_obs[:, 21:24])
+        # shape one-hot
+        shape_one_hot = state_obs[:, 24:]
+        shape_one_hot.zero_()
+        shape_one_hot.scatter_(1, self.current_target_model_id.unsqueeze(1), 1.0)
+
+        return {"policy": state_obs}
 
     def get_target_model_pose(self) -> torch.Tensor:
         """Returns the world pose of the current target object in env-local coords.
@@ -230,28 +264,51 @@ class AssemblyKitEnv(DirectRLEnv):
         Returns:
             Tensor of shape (num_envs, 7) with position and quaternion orientation.
         """
+        return self._target_model_pose().clone()
 
-        # Get the index of the target object for each environment
-        target_models: list[RigidObject] = [self.models[idx.item()] for idx in self.current_target[:, 0]]
+    def _target_model_pose(self) -> torch.Tensor:
+        """Returns the target pose shared by the dones, rewards and observations of a step.
 
-        target_model_pose = torch.zeros((self.num_envs, 7), dtype=torch.float32, device=self.device)
+        The pose is cached so it is gathered only once per step. The cache is dropped at the start of
+        :meth:`_get_dones` (first consumer after physics), after resets and before the observations when
+        interval events are configured. Model root states written through any other path are only picked
+        up after calling :meth:`_invalidate_step_caches`. The returned tensor must not be modified.
+        """
+        if self._cached_target_pose is not None:
+            return self._cached_target_pose
+
+        # Stack the root states of all models: (num_models, num_envs, 13)
+        all_root_states = torch.stack([model.data.root_state_w for model in self.models], dim=0, out=self._root_buf)
 
-        for idx, model in enumerate(target_models):
-            target_model_pose[idx] = model.data.root_state_w[idx, :7]
+        # Gather the target object root pose for each environment
+        model_ids = self.current_target.squeeze(1)
+        env_ids = torch.arange(self.num_envs, device=self.device)
+        target_model_pose = all_root_states[model_ids, env_ids, :7]
 
         # convert to env-local
         target_model_pose[:, :3] -= self.scene.env_origins
 
+        self._cached_target_pose = target_model_pose
         return target_model_pose
 
+    def _invalidate_step_caches(self) -> None:
+        """Drops the cached target pose and success mask.
+
+        Call this after writing model root states outside of :meth:`_reset_idx`.
+        """
+        self._cached_target_pose = None
+        self._cached_success = None
+
     def _get_rewards(self) -> torch.Tensor:
-        success_mask = self.is_success()
+        success_mask = self._success_mask()
         ones = torch.ones_like(success_mask, dtype=torch.int, device=self.device)
         return torch.where(success_mask, ones, -ones)
 
     def _get_dones(self) -> tuple[torch.Tensor, torch.Tensor]:
+        # first consumer after the physics step, the models have moved since the caches were filled
+        self._invalidate_step_caches()
 
-        done = self.is_success()
+        done = self._success_mask()
         if self.cfg.robot_controller == "task_space":
             timeout = torch.zeros_like(done, dtype=torch.bool)
         else:
@@ -269,44 +326,31 @@ class AssemblyKitEnv(DirectRLEnv):
         Returns:
             Boolean tensor per env indicating success.
         """
+        return self._success_mask(pos_eps, rot_eps, height_eps).clone()
 
-        target_model_pose = self.get_target_model_pose()
-
-        # Compute positional difference (XY-plane)
-        pos_diff = self.target_model_goal_pos[:, :2] - target_model_pose[:, :2]
-        pos_diff_norm = torch.norm(pos_diff, dim=1)
-        pos_correct = pos_diff_norm < pos_eps
-
-        # Compute rotational difference considering symmetry
-        target_model_quat = target_model_pose[:, 3:7]
-        target_model_euler = euler_xyz_from_quat(target_model_quat)
-        target_model_z_rot = target_model_euler[2]
+    def _success_mask(self, pos_eps=2e-2, rot_eps=math.radians(4), height_eps=3e-3) -> torch.Tensor:
+        """Returns the success mask of the step, cached under the same rules as :meth:`_target_model_pose`.
 
-        goal_z_rot = self.target_model_goal_rot
-        rot_diff = torch.abs(target_model_z_rot - goal_z_rot) % self.symmetry[self.current_target_model_id]
+        The returned tensor must not be modified.
+        """
+        eps = (pos_eps, rot_eps, height_eps)
+        if self._cached_success is not None and self._cached_success[0] == eps:
+            return self._cached_success[1]
 
-        # Adjust symmetry difference
+        target_model_pose = self._target_model_pose()
         symmetry_val = self.symmetry[self.current_target_model_id]
-        half_symmetry = symmetry_val / 2
-        rot_diff = torch.where(rot_diff > half_symmetry, symmetry_val - rot_diff, rot_diff)
-        rot_correct = rot_diff < rot_eps
-
-        # Check height to determine if the object is correctly placed in the slot
-
-        local_up = torch.tensor([0.0, 0.0, 1.0], device=self.device).expand(self.num_envs, 3)
-        env_normal = torch.tensor([0.0, 0.0, 1.0], device=self.device).expand(self.num_envs, 3)
-        obj_up_world = quat_apply(target_model_quat, local_up)
 
-        upright_cos = (obj_up_world * env_normal).sum(dim=1).clamp(-1.0, 1.0)
-        flip_mask = upright_cos < 0
-
-        thr_upright = torch.full((self.num_envs,), height_eps, device=self.device)
-        thr_flipped = torch.full((self.num_envs,), 0.023, device=self.device)
-        height_thr = torch.where(flip_mask, thr_flipped, thr_upright)
-
-        height_correct = target_model_pose[:, 2] < height_thr
-
-        return pos_correct & rot_correct & height_correct
+        success = compute_success(
+            target_model_pose,
+            self.target_model_goal_pos,
+            self.target_model_goal_rot,
+            symmetry_val,
+            pos_eps,
+            rot_eps,
+            height_eps,
+        )
+        self._cached_success = (eps, success)
+        return success
 
     def _reset_idx(self, env_ids: Sequence[int] | None):
         """Resets robot, kit, and object states for the given env indices.
@@ -316,6 +360,10 @@ class AssemblyKitEnv(DirectRLEnv):
         """
         if env_ids is None:
             env_ids = self.robot._ALL_INDICES
+        if not torch.is_tensor(env_ids):
+            env_ids = torch.as_tensor(env_ids, dtype=torch.long, device=self.device)
+        elif env_ids.device != torch.device(self.device) or env_ids.dtype != torch.long:
+            env_ids = env_ids.to(self.device, dtype=torch.long)
         super()._reset_idx(env_ids)
         # Resetting the robot
         joint_pos = self.robot.data.default_joint_pos[env_ids]
@@ -329,13 +377,14 @@ class AssemblyKitEnv(DirectRLEnv):
         self.robot.write_joint_state_to_sim(joint_pos, joint_vel, None, env_ids)
 
         # resetting kit
-        kit_default_state = self.kit.data.default_root_state.clone()[env_ids]
+        # indexing with the env_ids tensor already returns a copy of the rows
+        kit_default_state = self._kit_default_state[env_ids]
         kit_default_state[:, :3] += self.scene.env_origins[env_ids]
         self.kit.write_root_pose_to_sim(kit_default_state[:, :7], env_ids)
         self.kit.write_root_velocity_to_sim(kit_default_state[:, 7:], env_ids)
 
         # sample objects for the environments
-        self.sample_models_for_envs(torch.as_tensor(env_ids, dtype=torch.long, device=self.device))
+        self.sample_models_for_envs(env_ids)
 
     def sample_models_for_envs(self, env_ids: torch.Tensor) -> None:
         """Randomly selects a target model and places others at goal or side positions.
@@ -351,24 +400,22 @@ class AssemblyKitEnv(DirectRLEnv):
 
         # determine kit positions
         kit_ids = self.kit_ids_per_env[env_ids]
-        kit_default_state = self.kit.data.default_root_state.clone()[env_ids]
-        kit_pos = kit_default_state[:, :3]
+        kit_pos = self._kit_default_state[env_ids, :3]
 
         # pulling JSON target poses for the other model
         model_rel_pos = self.model_target_pos[kit_ids]
         model_rel_rot = self.model_target_rot[kit_ids]
 
         # pick target model and compute other model indices
-        choice = torch.randint(0, num_models, (num_envs,), device=device)
+        choice = torch.randint(0, num_models, (num_envs,), device=device, generator=self._gen)
         self.current_target[env_ids] = choice.unsqueeze(1)
-        self.current_target_model_id = (
-            torch.tensor([info["model_ids"] for info in self.env_assets_info], device=self.device)
-            .gather(1, self.current_target)
-            .squeeze(1)
+        self.current_target_model_id.index_copy_(
+            0, env_ids, self.model_ids_matrix_per_env[env_ids].gather(1, choice.unsqueeze(1)).squeeze(1)
         )
-        all_cols = torch.arange(num_models, device=device).unsqueeze(0).expand(num_envs, num_models)
-        others_mask = all_cols != choice.unsqueeze(1)
-        others_idx = all_cols[others_mask].view(num_envs, num_models - 1)
+        # others are all columns but the chosen one: j if j < choice else j + 1
+        others_cols = torch.arange(num_models - 1, device=device).unsqueeze(0)
+        others_idx = others_cols + (others_cols >= choice.unsqueeze(1)).long()
+        self.current_others[env_ids] = others_idx
 
         # compute and target starting poses
         sampled_idx = torch.randint(
@@ -376,10 +423,11 @@ class AssemblyKitEnv(DirectRLEnv):
             high=self.kit_target_starting_pos.shape[1],
             size=(num_envs,),
             device=device,
+            generator=self._gen,
         )
         offsets = self.kit_target_starting_pos[kit_ids, sampled_idx]
         target_pos = kit_pos + offsets
-        rot_t = torch.rand(num_envs, device=device) * 2 * math.pi
+        rot_t = torch.rand(num_envs, device=device, generator=self._gen) * 2 * math.pi
         target_quat = quat_from_euler_xyz(
             torch.zeros(num_envs, device=device),
             torch.zeros(num_envs, device=device),
@@ -387,65 +435,87 @@ class AssemblyKitEnv(DirectRLEnv):
         )
 
         # Storing the target poses and orientations for observation and reward
-        self.target_model_goal_pos[env_ids] = (
-            model_rel_pos[torch.arange(model_rel_pos.size(0), device=choice.device), choice][env_ids] + kit_pos[env_ids]
-        )
-        self.target_model_goal_rot[env_ids] = model_rel_rot[
-            torch.arange(model_rel_pos.size(0), device=choice.device), choice
-        ]
+        rows = torch.arange(num_envs, device=device)
+        self.target_model_goal_pos[env_ids] = model_rel_pos[rows, choice] + kit_pos
+        self.target_model_goal_rot[env_ids] = model_rel_rot[rows, choice]
 
         # compute world-space poses + rots for others models
-        idx_b = torch.arange(num_envs, device=device).unsqueeze(1)
+        idx_b = rows.unsqueeze(1)
         others_pos = model_rel_pos[idx_b, others_idx]
         others_rot = model_rel_rot[idx_b, others_idx]
 
         # determine which others to place at the side
         mask_other_to_side = torch.zeros_like(others_rot, dtype=torch.bool, device=device)
-        do_pick = torch.rand(num_envs, device=device) < 0.5
-        if do_pick.any():
-            cols = torch.randint(0, num_models - 1, (num_envs,), device=device)
-            rows = torch.arange(num_envs, device=device)
-            mask_other_to_side[rows[do_pick], cols[do_pick]] = True
-        others_pos[mask_other_to_side] = torch.tensor(
-            [[-self.cfg.TABLE_OFFSET, 0.2, 0.1]],
-            device=device,
-            dtype=others_pos.dtype,
-        )
+        do_pick = torch.rand(num_envs, device=device, generator=self._gen) < 0.5
+        cols = torch.randint(0, num_models - 1, (num_envs,), device=device, generator=self._gen)
+        mask_other_to_side[rows, cols] = do_pick
+        others_pos[mask_other_to_side] = self._side_pos
         others_pos_w = kit_pos.unsqueeze(1).expand(num_envs, num_models - 1, 3) + others_pos
-        others_rot_w = others_rot
-        # flatten for per-model grouping
-        envs_o_flat = env_ids.unsqueeze(1).expand(num_envs, num_models - 1).reshape(-1)
-        idx_o_flat = others_idx.reshape(-1)
-        pos_o_flat = others_pos_w.reshape(-1, 3)
-        rot_o_flat = others_rot_w.reshape(-1)
-
-        # Setting poses and orientations for the target and other models
+        others_quat_w = quat_from_euler_xyz(
+            torch.zeros_like(others_rot),
+            torch.zeros_like(others_rot),
+            others_rot,
+        )
+
+        # default root states of all models for the reset envs: (num_envs, num_models, 13)
+        all_model_state = torch.stack([model.data.default_root_state[env_ids] for model in models], dim=1)
+        # scatter the target and other poses into their model columns
+        all_model_pos = all_model_state[..., :3]
+        all_model_quat = all_model_state[..., 3:7]
+        all_model_pos.scatter_(1, others_idx.unsqueeze(-1).expand(-1, -1, 3), others_pos_w)
+        all_model_quat.scatter_(1, others_idx.unsqueeze(-1).expand(-1, -1, 4), others_quat_w)
+        all_model_pos.scatter_(1, choice.view(-1, 1, 1).expand(-1, 1, 3), target_pos.unsqueeze(1))
+        all_model_quat.scatter_(1, choice.view(-1, 1, 1).expand(-1, 1, 4), target_quat.unsqueeze(1))
+        all_model_pos += self.scene.env_origins[env_ids].unsqueeze(1)
+
+        # Setting poses, orientations and default velocities for the target and other models.
+        # write_root_state_to_sim still issues a pose and a velocity write per model (2 * num_models PhysX
+        # submissions); only the per-model clone / overwrite of the default state went away
         for model_idx in range(num_models):
-            default = models[model_idx].data.default_root_state[env_ids].clone()
-
-            mask_t = choice == model_idx
-            if mask_t.any():
-                envs_t = env_ids[mask_t]
-                poses_t = target_pos[mask_t]
-                quats_t = target_quat[mask_t]
-
-                default[envs_t, :3] = poses_t
-                default[envs_t, 3:7] = quats_t
-
-            mask_o = idx_o_flat == model_idx
-            if mask_o.any():
-                envs_o = envs_o_flat[mask_o]
-                poses_o = pos_o_flat[mask_o]
-                rots_o = rot_o_flat[mask_o]
-
-                quats_o = quat_from_euler_xyz(
-                    torch.zeros_like(mask_o.sum(), device=device),
-                    torch.zeros_like(mask_o.sum(), device=device),
-                    rots_o,
-                )
-
-                default[envs_o, :3] = poses_o
-                default[envs_o, 3:7] = quats_o
-
-            default[:, :3] += self.scene.env_origins[env_ids]
-            models[model_idx].write_root_pose_to_sim(default[:, :7], env_ids)
+            models[model_idx].write_root_state_to_sim(all_model_state[:, model_idx], env_ids)
+
+        # the target assignment and model poses changed
+        self._invalidate_step_caches()
+
+
+@torch.jit.script
+def quat_yaw(quat: torch.Tensor) -> torch.Tensor:
+    """Extracts the rotation around the Z axis from quaternions in (w, x, y, z) order.
+
+    Equivalent to the yaw returned by :func:`isaaclab.utils.math.euler_xyz_from_quat` without
+    computing the roll and pitch angles.
+    """
+    w, x, y, z = quat.unbind(-1)
+    return torch.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+
+
+@torch.jit.script
+def compute_success(
+    target_model_pose: torch.Tensor,
+    goal_pos: torch.Tensor,
+    goal_rot: torch.Tensor,
+    symmetry: torch.Tensor,
+    pos_eps: float,
+    rot_eps: float,
+    height_eps: float,
+) -> torch.Tensor:
+    # Compute positional difference (XY-plane)
+    pos_diff = goal_pos[:, :2] - target_model_pose[:, :2]
+    pos_correct = (pos_diff * pos_diff).sum(dim=1) < pos_eps * pos_eps
+
+    # Compute rotational difference considering symmetry
+    target_model_quat = target_model_pose[:, 3:7]
+    rot_diff = torch.abs(quat_yaw(target_model_quat) - goal_rot) % symmetry
+    rot_diff = torch.minimum(rot_diff, symmetry - rot_diff)
+    rot_correct = rot_diff < rot_eps
+
+    # Check height to determine if the object is correctly placed in the slot.
+    # The z component of the rotated up axis tells whether the object is flipped.
+    qx = target_model_quat[:, 1]
+    qy = target_model_quat[:, 2]
+    flip_mask = 1.0 - 2.0 * (qx * qx + qy * qy) < 0.0
+    height = target_model_pose[:, 2]
+    height_thr = torch.full_like(height, height_eps).masked_fill(flip_mask, 0.023)
+    height_correct = height < height_thr
+
+    return pos_correct & rot_correct & height_correct
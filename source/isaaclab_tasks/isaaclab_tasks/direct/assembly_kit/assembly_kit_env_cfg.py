@@ -5,8 +5,8 @@
 
 
 import json
-import random
 import torch
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import isaaclab.sim as sim_utils
@@ -30,8 +30,7 @@ def parse_json_episode_data(asset_dir) -> tuple[
     bool,
 ]:
     """Parse the JSON episode data from the asset directory."""
-    with open(asset_dir.joinpath("episodes.json")) as json_data:
-        episode_json = json.load(json_data)
+    episode_json = json.loads(asset_dir.joinpath("episodes.json").read_bytes())
     episodes = episode_json["episodes"]
 
     color = episode_json["config"]["color"]
@@ -69,9 +68,10 @@ def compute_asset_paths(kit_dir: Path, model_dir: Path) -> tuple[
     kit_model_positions = []
     kit_model_rots = []
     kit_target_starting_pos = []
-    for kit_json_path in kit_json_paths:
-        with open(kit_json_path) as json_data:
-            kit_json = json.load(json_data)
+    # Reading the (many small) kit files concurrently, parsing stays in order
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        kit_json_bytes = list(executor.map(lambda p: Path(p).read_bytes(), kit_json_paths))
+    for kit_json in map(json.loads, kit_json_bytes):
         kit_model_ids.append([obj["object_id"] for obj in kit_json["objects"]])
         poses = [o["pos"] for o in kit_json["objects"]]
         rots = [o["rot"] for o in kit_json["objects"]]
@@ -127,16 +127,20 @@ def get_kit_cfg(kit_usd_paths: list[str]) -> RigidObjectCfg:
 
 
 def get_model_cfg(model_paths: list[str], model_idx: int, color) -> RigidObjectCfg:
-    """Generates the RigidObjectCfg for a single model with randomized color.
+    """Generates the RigidObjectCfg for a single model.
+
+    The spawn config is shared by the model in every env, so its color is picked deterministically
+    from the model index. Per-env coloring has to go through a visual material override instead.
 
     Args:
         model_paths: List of USD paths for the model variants.
         model_idx:   Index of this model in the kit.
+        color:       List of RGBA colors to pick from.
 
     Returns:
         Config object for spawning the model in the scene.
     """
-    r, g, b, a = color[random.randint(0, len(color) - 1)]
+    r, g, b, a = color[model_idx % len(color)]
 
     return RigidObjectCfg(
         prim_path=f"/World/envs/env_.*/Model_{model_idx}",